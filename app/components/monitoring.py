@@ -2,8 +2,9 @@
 Real-time monitoring dashboard components
 """
 import asyncio
-from datetime import datetime, timedelta
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from nicegui import ui
@@ -15,6 +16,8 @@ class MonitoringDashboard:
     def __init__(self):
         self.is_monitoring = False
         self.update_interval = 5  # seconds
+        self._performance_data: Optional[pd.DataFrame] = None
+        self._performance_data_at = 0.0
         
     async def start_monitoring(self):
         """Start real-time monitoring"""
@@ -55,16 +58,31 @@ class MonitoringDashboard:
                     ui.label('Active Connections').classes('text-sm text-gray-600')
                     ui.label('1,247').classes('text-xl font-bold text-blue-600')
     
+    def get_performance_data(self) -> pd.DataFrame:
+        """Get the last 30 minutes of performance samples (cached for one update interval)"""
+        now = time.monotonic()
+        if self._performance_data is not None and now - self._performance_data_at < self.update_interval:
+            return self._performance_data
+        
+        # Generate sample performance data as datetime64 / int arrays directly
+        timestamps = pd.date_range(end=pd.Timestamp.now() - pd.Timedelta(minutes=1), periods=30, freq='min')
+        response_times = 50 + (np.arange(30) % 5) * 10
+        
+        self._performance_data = pd.DataFrame({
+            'timestamp': timestamps,
+            'response_time_ms': response_times
+        })
+        self._performance_data_at = now
+        return self._performance_data
+    
     def create_performance_chart(self):
         """Create performance monitoring chart"""
-        # Generate sample performance data
-        timestamps = [datetime.now() - timedelta(minutes=x) for x in range(30, 0, -1)]
-        response_times = [50 + (i % 5) * 10 for i in range(30)]
+        data = self.get_performance_data()
         
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=timestamps,
-            y=response_times,
+            x=data['timestamp'],
+            y=data['response_time_ms'],
             mode='lines+markers',
             name='Response Time (ms)',
             line=dict(color='#3182ce', width=2)
@@ -5,6 +5,9 @@ import os
 from typing import Optional
 from pydantic_settings import BaseSettings
 
+# Project root, so data paths do not depend on the working directory
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class Settings(BaseSettings):
     """Application settings with environment variable support"""
@@ -31,6 +34,7 @@ class Settings(BaseSettings):
     fraud_threshold: float = 0.7
     high_risk_threshold: float = 0.9
     alert_email: str = "security@irishbank.ie"
+    fraud_model_path: str = os.path.join(BASE_DIR, "data", "fraud_model.joblib")
     
     # External API Configuration
     bank_api_url: str = "https://api.irishbank.ie"
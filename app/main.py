@@ -15,6 +15,7 @@ from core.database import get_db, init_db
 from core.security import verify_password, create_access_token, get_password_hash
 from models.schemas import Transaction, FraudAlert, User, TransactionCreate
 from services.fraud_detection import FraudDetectionService
+from services.ml_models import get_ml_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -88,6 +89,9 @@ async def initialize_data():
         global fraud_service
         fraud_service = FraudDetectionService()
         
+        # Train the ML model service off the event loop
+        await get_ml_service().start()
+        
         logger.info("Application initialized successfully")
         
     except Exception as e:
@@ -6,14 +6,38 @@ import random
 import string
 from datetime import datetime, timedelta
 from typing import List
+import joblib
 import numpy as np
 
-from models.schemas import Transaction, Merchant, Card, Location, TransactionStatus, RiskLevel
+from models.schemas import (
+    Transaction, Merchant, Card, Location, TransactionStatus, RiskLevel
+)
 
 def generate_transaction_id() -> str:
     """Generate a unique transaction ID"""
     return f"TXN_{''.join(random.choices(string.ascii_uppercase + string.digits, k=12))}"
 
+# Batches with at least this many rows spread tree-ensemble scoring across threads
+PARALLEL_PREDICT_MIN_ROWS = 256
+
+# Model feature layouts, in matrix column order: the FraudDetectionService
+# classifier and the MLModelService classifier/anomaly detector
+FRAUD_FEATURE_COLUMNS = (
+    'amount', 'hour', 'day_of_week', 'merchant_risk_score',
+    'velocity_1h', 'velocity_24h', 'amount_zscore', 'location_risk'
+)
+ML_FEATURE_COLUMNS = (
+    'amount', 'hour', 'day_of_week', 'merchant_risk',
+    'location_risk', 'velocity_score', 'amount_zscore', 'time_since_last'
+)
+
+def threaded_decision_function(model, X: np.ndarray) -> np.ndarray:
+    """Tree-ensemble decision_function, threaded across trees only for large batches"""
+    # The joblib backend config is thread-local, so concurrent callers do not interfere
+    n_jobs = -1 if len(X) >= PARALLEL_PREDICT_MIN_ROWS else 1
+    with joblib.parallel_backend('threading', n_jobs=n_jobs):
+        return model.decision_function(X)
+
 def generate_sample_data(count: int = 100) -> List[Transaction]:
     """Generate sample transaction data for demonstration"""
     transactions = []
@@ -38,6 +62,11 @@ def generate_sample_data(count: int = 100) -> List[Transaction]:
     # Sample countries
     countries = ["IRL", "GBR", "USA", "DEU", "FRA", "ESP", "ITA", "RUS", "CHN", "BRA"]
     
+    # Draw timestamp offsets up front (last week) so transactions are built
+    # newest first and need no sort afterwards
+    now = datetime.now()
+    minute_offsets = sorted(random.randint(1, 10080) for _ in range(count))
+    
     for i in range(count):
         merchant_data = random.choice(merchants)
         
@@ -45,11 +74,9 @@ def generate_sample_data(count: int = 100) -> List[Transaction]:
         transaction = Transaction(
             id=generate_transaction_id(),
             user_id=f"USER_{random.randint(1000, 9999)}",
-            amount=round(random.lognormal(4, 1.5), 2),  # Log-normal distribution for realistic amounts
+            amount=round(random.lognormvariate(4, 1.5), 2),  # Log-normal distribution for realistic amounts
             currency="EUR",
-            timestamp=datetime.now() - timedelta(
-                minutes=random.randint(1, 10080)  # Last week
-            ),
+            timestamp=now - timedelta(minutes=minute_offsets[i]),
             merchant=Merchant(
                 id=f"MERCH_{random.randint(100, 999)}",
                 name=merchant_data["name"],
@@ -114,9 +141,6 @@ def generate_sample_data(count: int = 100) -> List[Transaction]:
         
         transactions.append(transaction)
     
-    # Sort by timestamp (newest first)
-    transactions.sort(key=lambda x: x.timestamp, reverse=True)
-    
     return transactions
 
 def format_currency(amount: float, currency: str = "EUR") -> str:
@@ -126,6 +150,16 @@ def format_currency(amount: float, currency: str = "EUR") -> str:
     else:
         return f"{amount:,.2f} {currency}"
 
+# Business hours lookup indexed by [weekday][hour]: Monday-Friday, 09:00-17:59
+_BUSINESS_HOURS = tuple(
+    tuple(weekday < 5 and 9 <= hour < 18 for hour in range(24))
+    for weekday in range(7)
+)
+
+def is_business_hours(timestamp: datetime) -> bool:
+    """Check whether a timestamp falls within bank business hours"""
+    return _BUSINESS_HOURS[timestamp.weekday()][timestamp.hour]
+
 def calculate_risk_color(risk_score: float) -> str:
     """Get color based on risk score"""
     if risk_score >= 0.7:
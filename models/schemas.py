@@ -2,9 +2,11 @@
 Irish Bank Fraud Detection System
 Pydantic models for data validation and serialization
 """
+import functools
+import re
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from enum import Enum
+from enum import Enum, IntEnum
 from pydantic import BaseModel, Field, validator
 from decimal import Decimal
 
@@ -37,6 +39,43 @@ class UserRole(str, Enum):
     INVESTIGATOR = "investigator"
     VIEWER = "viewer"
 
+class LocationTier(IntEnum):
+    """Location risk tier encoded at ingest"""
+    DOMESTIC = 0
+    TRUSTED = 1
+    OTHER = 2
+
+class MerchantTier(IntEnum):
+    """Merchant risk tier encoded at ingest"""
+    LOW = 0
+    MEDIUM = 1
+    HIGH = 2
+
+# Country -> location tier lookup; unlisted countries are LocationTier.OTHER
+LOCATION_TIERS = {
+    'IRL': LocationTier.DOMESTIC,
+    'GBR': LocationTier.TRUSTED,
+    'USA': LocationTier.TRUSTED,
+    'CAN': LocationTier.TRUSTED,
+    'AUS': LocationTier.TRUSTED,
+}
+
+# Merchant name keywords, each tier compiled into one alternation
+_HIGH_RISK_MERCHANT_RE = re.compile('cash|advance|gambling|crypto|unknown')
+_MEDIUM_RISK_MERCHANT_RE = re.compile('online|gas|atm')
+
+@functools.lru_cache(maxsize=8192)
+def classify_merchant(merchant_name: str) -> MerchantTier:
+    """Classify a merchant by risk keywords in its name"""
+    merchant_lower = merchant_name.lower()
+    
+    if _HIGH_RISK_MERCHANT_RE.search(merchant_lower):
+        return MerchantTier.HIGH
+    elif _MEDIUM_RISK_MERCHANT_RE.search(merchant_lower):
+        return MerchantTier.MEDIUM
+    else:
+        return MerchantTier.LOW
+
 class Location(BaseModel):
     """Geographic location model"""
     country: str = Field(..., min_length=2, max_length=3)
@@ -44,6 +83,11 @@ class Location(BaseModel):
     latitude: Optional[float] = Field(None, ge=-90, le=90)
     longitude: Optional[float] = Field(None, ge=-180, le=180)
     ip_address: Optional[str] = Field(None, pattern=r'^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$')
+    
+    @validator('country')
+    def normalize_country(cls, v):
+        """Store country codes upper-cased so lookups need no per-call normalization"""
+        return v.upper()
 
 class Merchant(BaseModel):
     """Merchant information model"""
@@ -88,6 +132,17 @@ class Transaction(BaseModel):
         json_encoders = {
             datetime: lambda v: v.isoformat()
         }
+    
+    # Tier codes are always derived from the transaction itself, never taken from input
+    @property
+    def location_code(self) -> LocationTier:
+        """Location risk tier of the transaction country"""
+        return LOCATION_TIERS.get(self.location.country, LocationTier.OTHER)
+    
+    @property
+    def merchant_tier(self) -> MerchantTier:
+        """Merchant risk tier from keywords in the merchant name"""
+        return classify_merchant(self.merchant.name)
 
 class RiskFactor(BaseModel):
     """Individual risk factor model"""
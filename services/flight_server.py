@@ -0,0 +1,89 @@
+"""
+Irish Bank Fraud Detection System
+Arrow Flight endpoint for batched fraud scoring
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.flight as flight
+
+from services.ml_models import MLModelService, get_ml_service
+
+logger = logging.getLogger(__name__)
+
+# Clients send record batches with transaction_id, amount, timestamp, merchant and
+# location columns; scores are streamed back per transaction
+RESPONSE_SCHEMA = pa.schema([
+    ('transaction_id', pa.string()),
+    ('risk_score', pa.float32()),
+])
+
+
+class FraudScoringFlightServer(flight.FlightServerBase):
+    """Flight server that scores streamed record batches of transactions"""
+    
+    def __init__(self, location: str = 'grpc://0.0.0.0:8815',
+                 ml_service: Optional[MLModelService] = None, **kwargs):
+        super().__init__(location, **kwargs)
+        self.ml_service = ml_service or get_ml_service()
+        
+        # Flight handlers run on gRPC threads; the async service runs on its own loop
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+    
+    def start_models(self):
+        """Train the ML models if they are not trained yet"""
+        if not self.ml_service.is_trained:
+            asyncio.run_coroutine_threadsafe(self.ml_service.start(), self._loop).result()
+    
+    def do_exchange(self, context, descriptor, reader, writer):
+        """Score each incoming record batch and stream back one batch of scores"""
+        writer.begin(RESPONSE_SCHEMA)
+        for chunk in reader:
+            if chunk.data is not None and chunk.data.num_rows:
+                writer.write_batch(self._score_batch(chunk.data))
+    
+    def _score_batch(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        """Score one record batch, passing its columns straight to the ML service"""
+        timestamps = batch.column('timestamp')
+        scores = asyncio.run_coroutine_threadsafe(
+            self.ml_service.predict_fraud_risk_columns(
+                batch.column('amount').to_numpy(zero_copy_only=False),
+                pc.hour(timestamps).to_numpy(zero_copy_only=False),
+                pc.day_of_week(timestamps).to_numpy(zero_copy_only=False),
+                batch.column('merchant').to_pylist(),
+                batch.column('location').to_pylist()
+            ),
+            self._loop
+        ).result()
+        
+        return pa.RecordBatch.from_arrays(
+            [batch.column('transaction_id'), pa.array(np.asarray(scores, dtype=np.float32))],
+            schema=RESPONSE_SCHEMA
+        )
+    
+    def shutdown(self):
+        """Stop serving and the service event loop"""
+        super().shutdown()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def serve():
+    """Run the Flight scoring server until shut down"""
+    port = int(os.getenv('FLIGHT_PORT', 8815))
+    server = FraudScoringFlightServer(f'grpc://0.0.0.0:{port}')
+    server.start_models()
+    
+    logger.info(f"Fraud scoring Flight server listening on port {port}")
+    server.serve()
+
+
+if __name__ == "__main__":
+    serve()
@@ -5,6 +5,15 @@ import pytest
 import asyncio
 from datetime import datetime
 from models.schemas import Transaction, User, FraudAlert
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def fraud_model_path(tmp_path, monkeypatch):
+    """Persist trained fraud models under a per-test temporary directory"""
+    path = tmp_path / "models" / "fraud_model.joblib"
+    monkeypatch.setattr(settings, "fraud_model_path", str(path))
+    return path
 
 
 @pytest.fixture
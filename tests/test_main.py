@@ -3,10 +3,29 @@ Tests for the main application
 """
 import pytest
 import asyncio
+import threading
+import time
+import numpy as np
 from datetime import datetime
-from models.schemas import Transaction, User
+from models.schemas import Transaction, User, Merchant, Card, Location
 from services.fraud_detection import FraudDetectionService
-from services.ml_models import MLModelService
+from services.ml_models import BatchingQueue, MLModelService, _rule_scores
+from core.utils import ML_FEATURE_COLUMNS
+
+
+def make_transaction(amount=100.0, merchant_name="Test Merchant", city="Dublin",
+                     country="IRL", hour=14, transaction_id="TEST001", merchant_risk=0.1):
+    """Build a transaction matching the current schema"""
+    return Transaction(
+        id=transaction_id,
+        user_id="USER_1001",
+        amount=amount,
+        timestamp=datetime(2024, 1, 10, hour, 0, 0),
+        merchant=Merchant(id="MERCH_100", name=merchant_name, category="retail",
+                          risk_score=merchant_risk, country=country),
+        card=Card(last4="1234", type="Visa", issuer="Irish Bank", country="IRL"),
+        location=Location(country=country, city=city)
+    )
 
 
 class TestFraudDetectionService:
@@ -134,6 +153,350 @@ class TestMLModelService:
         assert normal_risk_score <= 0.5
 
 
+class TestMLModelServiceBatch:
+    """Test cases for batched ML predictions on schema transactions"""
+    
+    @pytest.mark.asyncio
+    async def test_predict_fraud_risk_batch(self):
+        """Test batch and queued predictions for real transactions"""
+        ml_service = MLModelService()
+        transactions = [
+            make_transaction(amount=50.0, merchant_name="Tesco Cork", city="Cork"),
+            make_transaction(amount=5000.0, merchant_name="Cash Advance", city="Unknown", hour=3),
+            make_transaction(amount=300.0, merchant_name="Online Store", city=None, country="GBR"),
+        ]
+        
+        # Rule-based fallback before the models are trained
+        fallback_scores = await ml_service.predict_fraud_risk_batch(transactions)
+        assert fallback_scores.shape == (3,)
+        assert fallback_scores[1] > fallback_scores[0]
+        
+        await ml_service.start()
+        assert ml_service.is_trained
+        
+        scores = await ml_service.predict_fraud_risk_batch(transactions)
+        assert scores.shape == (3,)
+        assert all(0.0 <= score <= 1.0 for score in scores)
+        
+        risk_score = await ml_service.predict_fraud_risk(transactions[1])
+        assert isinstance(risk_score, float)
+        assert risk_score == pytest.approx(scores[1], abs=1e-6)
+    
+    @pytest.mark.asyncio
+    async def test_retrain_swaps_models(self):
+        """Test retraining replaces the live models only once training completes"""
+        ml_service = MLModelService()
+        await ml_service.start()
+        transactions = [make_transaction(amount=amount) for amount in (20.0, 800.0, 9000.0)]
+        scores = await ml_service.predict_fraud_risk_batch(transactions)
+        
+        X, y = ml_service._generate_training_data()
+        new_data = {column: X[:, i] for i, column in enumerate(ML_FEATURE_COLUMNS)}
+        new_data['is_fraud'] = y
+        
+        old_models = ml_service._models
+        retrain = asyncio.create_task(ml_service.retrain_models(new_data))
+        await asyncio.sleep(0)
+        # Predictions made while training is in flight still use the old models
+        assert ml_service._models is old_models
+        assert np.array_equal(await ml_service.predict_fraud_risk_batch(transactions), scores)
+        await retrain
+        
+        assert ml_service._models is not old_models
+        assert np.allclose(await ml_service.predict_fraud_risk_batch(transactions), scores)
+    
+    @pytest.mark.asyncio
+    async def test_scoring_uses_one_model_snapshot(self):
+        """Test a model swap during concurrent scoring does not reach the in-flight batch"""
+        class ConstantClassifier:
+            def predict_proba(self, X):
+                return np.ones((len(X), 2))
+        
+        ml_service = MLModelService()
+        await ml_service.start()
+        transactions = [make_transaction(amount=10.0 * (i + 1)) for i in range(64)]
+        expected = await ml_service.predict_fraud_risk_batch(transactions)
+        
+        # Hold both executor workers so the batch's model calls start only after the swap
+        release = threading.Event()
+        blockers = [ml_service._predict_executor.submit(release.wait) for _ in range(2)]
+        scoring = asyncio.create_task(ml_service.predict_fraud_risk_batch(transactions))
+        await asyncio.sleep(0)
+        
+        ml_service._models = ml_service._models._replace(fraud_classifier=ConstantClassifier())
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+        
+        assert np.array_equal(await scoring, expected)
+    
+    def test_rule_scores_match_rule_chain(self):
+        """Test the branchless fallback score against the original if/elif rules"""
+        def rule_chain(amount, hour, merchant_risk, location_risk):
+            score = 0.0
+            if amount > 1000:
+                score += 0.3
+            elif amount > 500:
+                score += 0.2
+            elif amount < 1:
+                score += 0.25
+            if hour < 6 or hour > 22:
+                score += 0.2
+            score += merchant_risk * 0.3
+            score += location_risk * 0.2
+            return min(1.0, score)
+        
+        cases = [
+            (amount, hour, merchant_risk, location_risk)
+            for amount in (0.5, 1.0, 250.0, 500.0, 500.01, 1000.0, 1000.01, 9000.0)
+            for hour in (0, 5, 6, 12, 22, 23)
+            for merchant_risk in (0.2, 0.5, 0.8)
+            for location_risk in (0.3, 0.9)
+        ]
+        amount, hour, merchant_risk, location_risk = (np.array(column) for column in zip(*cases))
+        
+        batch_scores = _rule_scores(amount, hour, merchant_risk, location_risk)
+        for i, case in enumerate(cases):
+            assert _rule_scores(*case) == pytest.approx(rule_chain(*case))
+            assert batch_scores[i] == pytest.approx(rule_chain(*case))
+    
+    @pytest.mark.asyncio
+    async def test_batching_queue_coalesces_requests(self):
+        """Test concurrent submissions are scored in as few batches as the size limit allows"""
+        batch_sizes = []
+        
+        async def predict_batch(transactions):
+            batch_sizes.append(len(transactions))
+            return np.array([t.amount / 1000 for t in transactions])
+        
+        queue = BatchingQueue(predict_batch, max_batch_size=4)
+        transactions = [make_transaction(amount=float(i + 1), transaction_id=f"TXN{i}") for i in range(10)]
+        
+        scores = await asyncio.gather(*(queue.submit(t) for t in transactions))
+        
+        assert batch_sizes == [4, 4, 2]
+        assert scores == pytest.approx([(i + 1) / 1000 for i in range(10)])
+    
+    @pytest.mark.asyncio
+    async def test_batching_queue_propagates_errors(self):
+        """Test a failed batch raises in every waiting caller and the queue keeps serving"""
+        fail = True
+        
+        async def predict_batch(transactions):
+            if fail:
+                raise ValueError("model unavailable")
+            return np.full(len(transactions), 0.25)
+        
+        queue = BatchingQueue(predict_batch)
+        transactions = [make_transaction(transaction_id=f"TXN{i}") for i in range(3)]
+        
+        results = await asyncio.gather(*(queue.submit(t) for t in transactions), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        
+        fail = False
+        assert await queue.submit(transactions[0]) == 0.25
+    
+    @pytest.mark.asyncio
+    async def test_batching_queue_dispatches_isolated_requests(self):
+        """Test a lone request is dispatched without waiting out the batching delay"""
+        async def predict_batch(transactions):
+            return np.full(len(transactions), 0.5)
+        
+        queue = BatchingQueue(predict_batch, max_delay_ms=5000.0)
+        
+        started = time.perf_counter()
+        assert await queue.submit(make_transaction()) == 0.5
+        assert time.perf_counter() - started < 1.0
+    
+    @pytest.mark.asyncio
+    async def test_batching_queue_serves_each_event_loop(self):
+        """Test one queue serves callers on several running event loops, each with its own worker"""
+        async def predict_batch(transactions):
+            await asyncio.sleep(0.05)
+            return np.array([t.amount for t in transactions])
+        
+        queue = BatchingQueue(predict_batch)
+        other_loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            for amount in (1.0, 2.0, 3.0):
+                # Submit on the other loop while this loop's batch is still in flight
+                pending = asyncio.create_task(queue.submit(make_transaction(amount=amount)))
+                await asyncio.sleep(0.01)
+                other = asyncio.run_coroutine_threadsafe(
+                    queue.submit(make_transaction(amount=amount + 10)), other_loop
+                )
+                
+                assert await pending == amount
+                assert await asyncio.wrap_future(other) == amount + 10
+            
+            assert len(queue._workers) == 2
+            assert not any(worker.done() for _, worker in queue._workers.values())
+        finally:
+            async def cancel_workers():
+                for task in asyncio.all_tasks() - {asyncio.current_task()}:
+                    task.cancel()
+            
+            asyncio.run_coroutine_threadsafe(cancel_workers(), other_loop).result(timeout=5)
+            other_loop.call_soon_threadsafe(other_loop.stop)
+            thread.join()
+            other_loop.close()
+
+
+class TestModelPersistence:
+    """Test cases for fraud model warm-start"""
+    
+    @pytest.mark.asyncio
+    async def test_trained_models_warm_start(self, fraud_model_path):
+        """Test a new service loads the models persisted by training"""
+        from core.utils import generate_sample_data
+        
+        assert FraudDetectionService().is_trained is False
+        
+        transactions = generate_sample_data(200)
+        for i, transaction in enumerate(transactions):
+            transaction.is_fraud = i % 5 == 0
+        
+        service = FraudDetectionService()
+        assert "error" not in await service.train_models(transactions)
+        assert fraud_model_path.exists()
+        
+        restored = FraudDetectionService()
+        assert restored.is_trained is True
+        X = restored._extract_features_batch(transactions[:10])
+        np.testing.assert_array_equal(restored._predict_ml_scores(X), service._predict_ml_scores(X))
+
+
+class TestBatchRiskAssessment:
+    """Test cases for vectorized rule-based risk assessment"""
+    
+    def test_failed_feature_extraction_still_scores_rules(self):
+        """Test a transaction whose features cannot be extracted is scored by the rules"""
+        from models.schemas import RiskLevel
+        
+        service = FraudDetectionService()
+        service.is_trained = True
+        service._predict_ml_score = lambda features: pytest.fail("ML scored without features")
+        
+        risky = make_transaction(amount=1500.0, merchant_risk=0.9)
+        assessment = service._assess_risk(risky, None)
+        assert [factor.name for factor in assessment.factors] == ["Merchant Risk"]
+        assert assessment.overall_score == pytest.approx(0.1 * 0.9)
+        assert assessment.risk_level == RiskLevel.LOW
+        assert assessment.model_confidence == 0.85
+        
+        assert service._assess_risk(make_transaction(merchant_risk=0.1), None).factors == []
+    
+    def test_batch_rules_match_risk_factors(self):
+        """Test batch scores and levels match the per-transaction risk factors"""
+        from services.fraud_detection import FeatIdx, _RISK_LEVELS
+        
+        service = FraudDetectionService()
+        transactions = [
+            make_transaction(amount=amount, hour=hour, country=country, merchant_risk=merchant_risk,
+                             transaction_id=f"TXN{i}")
+            for i, (amount, hour, country, merchant_risk) in enumerate([
+                (25.0, 14, "IRL", 0.1),
+                (1500.0, 3, "RUS", 0.9),
+                (8000.0, 23, "GBR", 0.5),
+                (999.0, 5, "USA", 0.4),
+                (1000.5, 0, "BRA", 0.45),
+                (60.0, 12, "DEU", 0.8),
+            ])
+        ]
+        
+        X = service._extract_features_batch(transactions)
+        # Cover both sides of the velocity threshold regardless of the simulated draws
+        X[::2, FeatIdx.V1H] = 7.5
+        X[1::2, FeatIdx.V1H] = 1.0
+        merchant_risk = np.array([t.merchant.risk_score for t in transactions])
+        scores, level_idx = service._assess_risk_batch(X, merchant_risk)
+        
+        for i, transaction in enumerate(transactions):
+            risk_factors = service._build_risk_factors(transaction, X[i])
+            assert scores[i] == pytest.approx(sum(f.weight * f.value for f in risk_factors))
+            
+            assessment = service._assess_risk(transaction, X[i])
+            assert assessment.risk_level == _RISK_LEVELS[level_idx[i]]
+            assert [f.name for f in assessment.factors] == [f.name for f in risk_factors]
+    
+    def test_batch_levels_match_at_threshold_boundaries(self):
+        """Test scores landing on a level threshold get the same level in batch and single paths"""
+        from services.fraud_detection import FeatIdx, _RISK_LEVELS
+        
+        service = FraudDetectionService()
+        # (amount, hour, location risk, merchant risk): float32 arithmetic lands these on the other
+        # side of 0.3 or 0.5, and merchant risk 0.4 is not above its threshold in float64
+        cases = [
+            (3500.0, 12, 0.45, 0.1),
+            (1750.0, 3, 0.45, 0.1),
+            (1250.0, 3, 0.35, 0.5),
+            (4250.0, 3, 0.45, 0.5),
+            (5000.0, 12, 0.1, 0.1),
+            (999.0, 3, 0.45, 0.4),
+        ]
+        transactions = [
+            make_transaction(amount=amount, hour=hour, merchant_risk=merchant_risk, transaction_id=f"TXN{i}")
+            for i, (amount, hour, _, merchant_risk) in enumerate(cases)
+        ]
+        
+        X = service._extract_features_batch(transactions)
+        X[:, FeatIdx.V1H] = 0.0
+        X[:, FeatIdx.LOC_RISK] = [location_risk for _, _, location_risk, _ in cases]
+        merchant_risk = np.array([t.merchant.risk_score for t in transactions])
+        scores, level_idx = service._assess_risk_batch(X, merchant_risk)
+        
+        for i, transaction in enumerate(transactions):
+            assessment = service._assess_risk(transaction, X[i])
+            assert scores[i] == sum(f.weight * f.value for f in assessment.factors)
+            assert _RISK_LEVELS[level_idx[i]] == assessment.risk_level
+
+
+class TestFlightServer:
+    """Test cases for the Arrow Flight scoring endpoint"""
+    
+    def test_do_exchange_round_trip(self):
+        """Test scores stream back for a record batch, including null merchants and locations"""
+        pa = pytest.importorskip("pyarrow")
+        flight = pytest.importorskip("pyarrow.flight")
+        from services.flight_server import FraudScoringFlightServer, RESPONSE_SCHEMA
+        
+        ml_service = MLModelService()
+        server = FraudScoringFlightServer('grpc://127.0.0.1:0', ml_service=ml_service)
+        try:
+            batch = pa.RecordBatch.from_pydict({
+                'transaction_id': ['TXN1', 'TXN2', 'TXN3'],
+                'amount': [50.0, 5000.0, 300.0],
+                'timestamp': pa.array([datetime(2024, 1, 10, 14), datetime(2024, 1, 10, 3),
+                                       datetime(2024, 1, 11, 9)], type=pa.timestamp('us')),
+                'merchant': ['Tesco Cork', None, 'Online Store'],
+                'location': ['Cork', 'Dublin', None],
+            })
+            
+            client = flight.connect(f'grpc://127.0.0.1:{server.port}')
+            writer, reader = client.do_exchange(flight.FlightDescriptor.for_command(b'score'))
+            writer.begin(batch.schema)
+            writer.write_batch(batch)
+            writer.done_writing()
+            result = reader.read_all()
+            writer.close()
+            client.close()
+        finally:
+            server.shutdown()
+        
+        assert result.schema.equals(RESPONSE_SCHEMA)
+        assert result.column('transaction_id').to_pylist() == ['TXN1', 'TXN2', 'TXN3']
+        
+        scores = result.column('risk_score').to_pylist()
+        expected = asyncio.run(ml_service.predict_fraud_risk_batch([
+            make_transaction(amount=50.0, merchant_name="Tesco Cork", city="Cork"),
+            make_transaction(amount=5000.0, merchant_name="Unknown", city="Dublin", hour=3),
+        ]))
+        assert scores[:2] == pytest.approx(list(expected), abs=1e-6)
+        assert 0.0 <= scores[2] <= 1.0
+
+
 class TestDataModels:
     """Test cases for data models"""
     
@@ -283,6 +646,36 @@ class TestUtilityFunctions:
         # Test late hours (Wednesday 11 PM)
         late_time = datetime(2024, 1, 10, 23, 0, 0)  # Wednesday 11 PM
         assert is_business_hours(late_time) is False
+    
+    def test_transaction_tiers(self):
+        """Test location and merchant tiers derived from the transaction"""
+        from models.schemas import LocationTier, MerchantTier
+        
+        domestic = make_transaction(merchant_name="Tesco Express", country="IRL")
+        assert domestic.location_code == LocationTier.DOMESTIC
+        assert domestic.merchant_tier == MerchantTier.LOW
+        
+        trusted = make_transaction(merchant_name="Online Store", country="GBR")
+        assert trusted.location_code == LocationTier.TRUSTED
+        assert trusted.merchant_tier == MerchantTier.MEDIUM
+        
+        other = make_transaction(merchant_name="Crypto Exchange", country="RUS")
+        assert other.location_code == LocationTier.OTHER
+        assert other.merchant_tier == MerchantTier.HIGH
+        
+        # Client-supplied tiers are ignored
+        data = other.model_dump()
+        data.update(location_code=LocationTier.DOMESTIC, merchant_tier=MerchantTier.LOW)
+        spoofed = Transaction(**data)
+        assert spoofed.location_code == LocationTier.OTHER
+        assert spoofed.merchant_tier == MerchantTier.HIGH
+        assert 'location_code' not in spoofed.model_dump()
+        
+        # Tiers follow later edits to the location and merchant
+        spoofed.location.country = "IRL"
+        spoofed.merchant.name = "Tesco Express"
+        assert spoofed.location_code == LocationTier.DOMESTIC
+        assert spoofed.merchant_tier == MerchantTier.LOW
 
 
 if __name__ == "__main__":